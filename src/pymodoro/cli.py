@@ -1,12 +1,13 @@
 import logging
-import json
 import math
-from pathlib import Path
+import os
 from socket import socket, AF_UNIX
 import argparse
+import re
+import sys
+import time
 
-import toml
-
+from .commands import Command
 from .responses import (
     PauseResponse,
     ResumeResponse,
@@ -14,66 +15,88 @@ from .responses import (
     StatusResponse,
     StopResponse,
 )
+from .wire import (
+    INVALID_COMMAND,
+    decode_response,
+    encode_request,
+    recv_message,
+    send_message,
+    socket_address,
+)
 
-from .commands import Command
+_DEFAULT_CONFIG_PATH = os.environ.get("PYMODORO_CONFIG") or os.path.expanduser(
+    "~/.config/pymodoro/config.toml"
+)
+_PADDED = [f"{i:02d}" for i in range(100)]
+_DURATION_PATTERN = re.compile(r"(?:(\d+)h)?(?:(\d+)m)?(?:(\d+)s)?")
+
+
+class DaemonClient:
+    def __init__(self, socket_path):
+        self._socket = socket(family=AF_UNIX)
+        try:
+            self._socket.connect(socket_address(socket_path))
+        except OSError:
+            self._socket.close()
+            raise
+
+    def send(self, command, duration=0):
+        request = encode_request(command, duration)
+        logging.debug("request=%r", request)
+        send_message(self._socket, request)
+        response = decode_response(recv_message(self._socket))
+        logging.debug("response=%r", response)
+        if response["response"] == INVALID_COMMAND:
+            raise RuntimeError("Error: Invalid command sent to daemon!")
+        return response
 
+    def close(self):
+        self._socket.close()
 
-def send_command(socket_path, command):
-    command = json.dumps(command).encode()
-    logging.debug(f"{command=}")
-    s = socket(family=AF_UNIX)
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def connect(socket_path):
     try:
-        s.connect(str(socket_path))
-    except ConnectionRefusedError:
+        return DaemonClient(socket_path)
+    except (ConnectionRefusedError, FileNotFoundError):
         print("Error: Could not connect to daemon! Is it running?")
         exit(1)
-    s.send(command)
-    response = json.loads(s.recv(4096).decode("utf-8"))
-    if response["response"] == "INVALID_COMMAND":
-        raise RuntimeError("Error: Invalid command sent to daemon!")
-    return response
+
+
+def send_command(socket_path, command, duration=0):
+    with connect(socket_path) as client:
+        return client.send(command, duration)
 
 
 def parse_duration(spec):
-    digits = []
-    units = ["h", "m", "s"]
-    largest = None
-    total = 0
-    for token in spec:
-        if token.isdigit():
-            digits.append(token)
-        elif token in units:
-            if largest and units.index(token) <= units.index(largest):
-                raise ValueError(
-                    f"Error: Expected unit smaller than '{largest}', got '{token}'!"
-                )
-            largest = token
-            if not digits:
-                raise ValueError(f"Error: Expected duration for unit '{token}'!")
-            duration = int("".join(digits))
-            digits.clear()
-            if token == "h":
-                duration *= 3600
-            elif token == "m":
-                duration *= 60
-            total += duration
-        else:
-            raise ValueError(
-                f"Error: Expected unit to be one of {units}, got '{token}'!"
-            )
-    if digits:
-        raise ValueError(f"Error: Expected unit for duration '{''.join(digits)}'!")
-    return total
+    match = _DURATION_PATTERN.fullmatch(spec)
+    if match is None or not any(match.groups()):
+        raise ValueError(
+            f"Error: Expected duration like '1h30m45s' with units in order h, m, s, got '{spec}'!"
+        )
+    hours, minutes, seconds = (int(group or 0) for group in match.groups())
+    return hours * 3600 + minutes * 60 + seconds
 
 
 def format_duration(duration):
     assert duration <= 99 * 3600, "Provided duration is too large to format!"
     assert duration >= 0, "Expected non-negative duration, received negative one!"
-    hours = duration // 3600
-    remaining = duration % 3600
-    minutes = remaining // 60
-    seconds = remaining % 60
-    return f"{hours:{0}>2}:{minutes:{0}>2}:{seconds:{0}>2}"
+    hours, remaining = divmod(duration, 3600)
+    minutes, seconds = divmod(remaining, 60)
+    return f"{_PADDED[hours]}:{_PADDED[minutes]}:{_PADDED[seconds]}"
+
+
+_START_MESSAGES = {
+    StartResponse.OK: lambda response: (
+        f"Timer for {format_duration(response['duration'])} started"
+    ),
+    StartResponse.ALREADY_RUNNING: lambda response: "Error: Timer is already running!",
+}
 
 
 def start(args, config):
@@ -89,51 +112,69 @@ def start(args, config):
     if duration > 99 * 3600:
         print(f"Error: Expected duration to be between 0s and 99h, got {duration}s")
         exit(1)
-    response = send_command(
-        args.socket, {"command": Command.START, "duration": duration}
-    )
-    match response:
-        case {"response": StartResponse.OK, "duration": duration}:
-            print(f"Timer for {format_duration(duration)} started")
-        case {"response": StartResponse.ALREADY_RUNNING}:
-            print("Error: Timer is already running!")
+    response = send_command(args.socket, Command.START, duration)
+    print(_START_MESSAGES[response["response"]](response))
+
+
+_STOP_MESSAGES = {
+    StopResponse.OK: "Timer stopped",
+    StopResponse.NOT_RUNNING: "Error: Timer not running!",
+}
 
 
 def stop(args, config):
-    match send_command(args.socket, {"command": Command.STOP}):
-        case {"response": StopResponse.OK}:
-            print("Timer stopped")
-        case {"response": StopResponse.NOT_RUNNING}:
-            print("Error: Timer not running!")
+    response = send_command(args.socket, Command.STOP)
+    print(_STOP_MESSAGES[response["response"]])
+
+
+_PAUSE_MESSAGES = {
+    PauseResponse.OK: "Timer paused",
+    PauseResponse.ALREADY_PAUSED: "Error: Timer is already paused!",
+    PauseResponse.NOT_RUNNING: "Error: Timer is not running!",
+}
 
 
 def pause(args, config):
-    match send_command(args.socket, {"command": Command.PAUSE}):
-        case {"response": PauseResponse.OK}:
-            print("Timer paused")
-        case {"response": PauseResponse.ALREADY_PAUSED}:
-            print("Error: Timer is already paused!")
-        case {"response": PauseResponse.NOT_RUNNING}:
-            print("Error: Timer is not running!")
+    response = send_command(args.socket, Command.PAUSE)
+    print(_PAUSE_MESSAGES[response["response"]])
+
+
+_RESUME_MESSAGES = {
+    ResumeResponse.OK: "Timer resumed",
+    ResumeResponse.NOT_PAUSED: "Error: Timer is not paused!",
+}
 
 
 def resume(args, config):
-    match send_command(args.socket, {"command": Command.RESUME}):
-        case {"response": ResumeResponse.OK}:
-            print("Timer resumed")
-        case {"response": ResumeResponse.NOT_PAUSED}:
-            print("Error: Timer is not paused!")
+    response = send_command(args.socket, Command.RESUME)
+    print(_RESUME_MESSAGES[response["response"]])
 
 
 def status(args, config):
-    match send_command(args.socket, {"command": Command.STATUS}):
+    if args.watch is None:
+        print(format_status(send_command(args.socket, Command.STATUS), args.simple))
+        return
+    with connect(args.socket) as client:
+        try:
+            while True:
+                print(format_status(client.send(Command.STATUS), args.simple))
+                time.sleep(args.watch)
+        except KeyboardInterrupt:
+            pass
+        except ConnectionError:
+            print("Error: Lost connection to daemon!")
+            exit(1)
+
+
+def format_status(response, simple):
+    match response:
         case {
             "response": StatusResponse.OK,
             "duration": duration,
             "remaining": remaining,
             "is_paused": is_paused,
         }:
-            if args.simple:
+            if simple:
                 message = format_duration(remaining)
             else:
                 remaining_percent = math.ceil(remaining / duration * 100)
@@ -141,51 +182,95 @@ def status(args, config):
                 message += f"{remaining_percent}% ({format_duration(remaining)}) of {format_duration(duration)} left"
             if is_paused:
                 message += " (paused)"
-            print(message)
+            return message
         case {"response": StatusResponse.OK}:
-            print("Inactive")
+            return "Inactive"
 
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument(
-        "-c",
-        "--config",
-        default=Path().home() / ".config/pymodoro/config.toml",
-        dest="config_path",
-    )
-    parser.add_argument(
-        "--log-level",
-        default="WARNING",
-        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
-    )
-    parser.add_argument("--socket", type=Path, default=Path("/tmp/pomodoro.sock"))
-    subparsers = parser.add_subparsers(required=True)
-
+def _add_start_parser(subparsers):
     start_parser = subparsers.add_parser("start")
     start_parser.add_argument("-d", "--duration", dest="duration_spec")
     start_parser.set_defaults(func=start)
 
+
+def _add_stop_parser(subparsers):
     stop_parser = subparsers.add_parser("stop")
     stop_parser.set_defaults(func=stop)
 
+
+def _add_pause_parser(subparsers):
     pause_parser = subparsers.add_parser("pause")
     pause_parser.set_defaults(func=pause)
 
+
+def _add_resume_parser(subparsers):
     resume_parser = subparsers.add_parser("resume")
     resume_parser.set_defaults(func=resume)
 
+
+def _add_status_parser(subparsers):
     status_parser = subparsers.add_parser("status")
     status_parser.add_argument("-s", "--simple", action="store_true")
+    status_parser.add_argument(
+        "-w", "--watch", type=float, metavar="SECONDS", dest="watch"
+    )
     status_parser.set_defaults(func=status)
 
+
+_SUBPARSER_BUILDERS = {
+    "start": _add_start_parser,
+    "stop": _add_stop_parser,
+    "pause": _add_pause_parser,
+    "resume": _add_resume_parser,
+    "status": _add_status_parser,
+}
+
+
+def _subparsers_for(argv):
+    # Build all subparsers when argparse has to list them in help or errors.
+    if "-h" in argv or "--help" in argv:
+        return _SUBPARSER_BUILDERS.values()
+    for arg in argv:
+        if arg in _SUBPARSER_BUILDERS:
+            return [_SUBPARSER_BUILDERS[arg]]
+    return _SUBPARSER_BUILDERS.values()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-c",
+        "--config",
+        default=_DEFAULT_CONFIG_PATH,
+        dest="config_path",
+    )
+    parser.add_argument(
+        "--log-level",
+        default="WARNING",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
+    )
+    parser.add_argument("--socket", default="/tmp/pomodoro.sock")
+    subparsers = parser.add_subparsers(required=True)
+    for add_subparser in _subparsers_for(sys.argv[1:]):
+        add_subparser(subparsers)
+
     args = parser.parse_args()
 
-    config = toml.load(args.config_path)["pymodoro"]
+    if args.func is start:
+        try:
+            import tomllib
+        except ModuleNotFoundError:
+            import tomli as tomllib
+
+        with open(args.config_path, "rb") as f:
+            config = tomllib.load(f)["pymodoro"]
+    else:
+        config = {}
 
-    logging.basicConfig(level=getattr(logging, args.log_level))
-    logging.debug(f"{args=}")
-    logging.debug(f"{config=}")
+    if args.log_level != "WARNING":
+        logging.basicConfig(level=getattr(logging, args.log_level))
+    logging.debug("args=%r", args)
+    logging.debug("config=%r", config)
 
     args.func(args, config)
 
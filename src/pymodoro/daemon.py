@@ -1,13 +1,16 @@
 import argparse
-import json
+import asyncio
 import logging
+import os
+import signal
 import subprocess
-import time
-import toml
-from multiprocessing import Pipe, Process
-from functools import partial
+from functools import lru_cache, partial
 from pathlib import Path
-from socket import AF_UNIX, socket
+
+try:
+    import tomllib
+except ModuleNotFoundError:
+    import tomli as tomllib
 
 from pymodoro.commands import Command
 from pymodoro.responses import (
@@ -17,6 +20,14 @@ from pymodoro.responses import (
     StatusResponse,
     StopResponse,
 )
+from pymodoro.wire import (
+    INVALID_COMMAND,
+    decode_request,
+    encode_response,
+    frame,
+    read_message,
+    socket_address,
+)
 
 
 class AlreadyRunning(Exception):
@@ -37,112 +48,217 @@ class NotPaused(Exception):
 
 class Timer:
     def __init__(self, config):
-        self._timer = None
+        self._task = None
         self._config = config
+        self._duration = None
+        self._deadline = None
+        self._paused_at = None
+        self._changed = asyncio.Event()
 
     def start(self, duration):
-        if self._is_running():
+        if self._running_task() is not None:
             raise AlreadyRunning
-        parent_conn, child_conn = Pipe()
-        process = Process(target=run_timer, args=(child_conn, duration, self._config))
-        process.start()
-        self._timer = {"process": process, "conn": parent_conn}
+        loop = asyncio.get_running_loop()
+        self._duration = duration
+        self._deadline = loop.time() + duration
+        self._paused_at = None
+        self._task = asyncio.create_task(self._run())
 
     def stop(self):
-        if not self._is_running():
+        if (task := self._running_task()) is None:
             raise NotRunning
-        assert self._timer is not None
-        self._timer["conn"].send("STOP")
+        task.cancel()
+        self._task = None
 
     def status(self):
-        if not self._is_running():
+        if self._running_task() is None:
             return
-        assert self._timer is not None
-        self._timer["conn"].send("STATUS")
-        return self._timer["conn"].recv()
+        return {
+            "duration": self._duration,
+            "remaining": max(0, round(self._remaining())),
+            "is_paused": self._paused_at is not None,
+        }
 
     def pause(self):
         if self._is_paused():
             raise AlreadyPaused
-        if not self._is_running():
+        if self._running_task() is None:
             raise NotRunning
-        assert self._timer is not None
-        self._timer["conn"].send("PAUSE")
+        self._paused_at = asyncio.get_running_loop().time()
+        self._changed.set()
 
     def resume(self):
         if not self._is_paused():
             raise NotPaused
-        assert self._timer
-        self._timer["conn"].send("RESUME")
-
-    def _cleanup(self):
-        if not self._timer:
-            return
-        if not self._timer["process"].is_alive():
-            self._timer = None
-
-    def _is_running(self):
-        self._cleanup()
-        return self._timer is not None
+        self._deadline += asyncio.get_running_loop().time() - self._paused_at
+        self._paused_at = None
+        self._changed.set()
+
+    async def _run(self):
+        self._config["begin_cmd"]()
+        try:
+            while (remaining := self._remaining()) > 0:
+                timeout = remaining if self._paused_at is None else None
+                self._changed.clear()
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            self._config["done_cmd"]()
+        finally:
+            self._config["end_cmd"]()
+
+    def _remaining(self):
+        if self._paused_at is not None:
+            return self._deadline - self._paused_at
+        return self._deadline - asyncio.get_running_loop().time()
+
+    def _running_task(self):
+        if self._task is not None and self._task.done():
+            self._task = None
+        return self._task
 
     def _is_paused(self):
-        status = self.status()
-        if status is None:
-            return False
-        return status["is_paused"]
-
-
-def run_timer(conn, duration, config):
-    pause_time = None
-    past_pause_duration = 0
-    total_pause_duration = 0
-    start_time = time.time()
-    config["begin_cmd"]()
-    while (
-        elapsed_duration := time.time() - start_time - total_pause_duration
-    ) < duration:
-        time.sleep(0.001)
-        if pause_time is not None:
-            total_pause_duration = past_pause_duration + time.time() - pause_time
-        if not conn.poll():
-            continue
-        match conn.recv():
-            case "STATUS":
-                conn.send(
-                    {
-                        "duration": duration,
-                        "remaining": round(duration - elapsed_duration),
-                        "is_paused": pause_time is not None,
-                    }
-                )
-            case "STOP":
-                break
-            case "PAUSE":
-                pause_time = time.time()
-            case "RESUME":
-                assert pause_time is not None
-                past_pause_duration += time.time() - pause_time
-                pause_time = None
-    else:
-        config["done_cmd"]()
-    config["end_cmd"]()
+        return self._running_task() is not None and self._paused_at is not None
 
 
 def load_config(path):
-    config = toml.load(path)["pymodorod"]
+    return _load_config(str(path), os.stat(path).st_mtime_ns)
+
+
+@lru_cache(maxsize=8)
+def _load_config(path, mtime_ns):
+    with open(path, "rb") as f:
+        config = tomllib.load(f)["pymodorod"]
     for command in ["done_cmd", "begin_cmd", "end_cmd"]:
         if command not in config:
             config[command] = lambda: None
         else:
-            config[command] = partial(subprocess.Popen, config[command])
+            config[command] = partial(
+                subprocess.Popen, config[command], close_fds=False
+            )
     return config
 
 
+async def serve(address, config):
+    timer = Timer(config)
+    server = await asyncio.start_unix_server(
+        partial(handle_client, timer), path=address
+    )
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in [signal.SIGINT, signal.SIGTERM]:
+        loop.add_signal_handler(signum, stopped.set)
+    await stopped.wait()
+    server.close()
+
+
+async def handle_client(timer, reader, writer):
+    try:
+        while (message := await read_message(reader)) is not None:
+            try:
+                command = decode_request(message)
+            except ValueError:
+                command = None
+            logging.debug("command=%r", command)
+            response = handle_command(timer, command)
+            logging.debug("response=%r", response)
+            writer.write(frame(response))
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError) as error:
+        logging.debug("Client disconnected early: %r", error)
+    except asyncio.CancelledError:
+        logging.debug("Closing client connection on shutdown")
+    finally:
+        writer.close()
+
+
+_INVALID_COMMAND = encode_response({"response": INVALID_COMMAND})
+_START_ALREADY_RUNNING = encode_response(
+    {"response": StartResponse.ALREADY_RUNNING}
+)
+_STOP_OK = encode_response({"response": StopResponse.OK})
+_STOP_NOT_RUNNING = encode_response({"response": StopResponse.NOT_RUNNING})
+_STATUS_INACTIVE = encode_response({"response": StatusResponse.OK})
+_PAUSE_OK = encode_response({"response": PauseResponse.OK})
+_PAUSE_ALREADY_PAUSED = encode_response(
+    {"response": PauseResponse.ALREADY_PAUSED}
+)
+_PAUSE_NOT_RUNNING = encode_response({"response": PauseResponse.NOT_RUNNING})
+_RESUME_OK = encode_response({"response": ResumeResponse.OK})
+_RESUME_NOT_PAUSED = encode_response({"response": ResumeResponse.NOT_PAUSED})
+
+
+def _handle_start(timer, command):
+    try:
+        timer.start(command["duration"])
+    except AlreadyRunning:
+        return _START_ALREADY_RUNNING
+    return encode_response(
+        {"response": StartResponse.OK, "duration": command["duration"]}
+    )
+
+
+def _handle_stop(timer, command):
+    try:
+        timer.stop()
+    except NotRunning:
+        return _STOP_NOT_RUNNING
+    return _STOP_OK
+
+
+def _handle_status(timer, command):
+    if (status := timer.status()) is None:
+        return _STATUS_INACTIVE
+    return encode_response(
+        {
+            "response": StatusResponse.OK,
+            "duration": status["duration"],
+            "remaining": status["remaining"],
+            "is_paused": status["is_paused"],
+        }
+    )
+
+
+def _handle_pause(timer, command):
+    try:
+        timer.pause()
+    except AlreadyPaused:
+        return _PAUSE_ALREADY_PAUSED
+    except NotRunning:
+        return _PAUSE_NOT_RUNNING
+    return _PAUSE_OK
+
+
+def _handle_resume(timer, command):
+    try:
+        timer.resume()
+    except NotPaused:
+        return _RESUME_NOT_PAUSED
+    return _RESUME_OK
+
+
+_HANDLERS = {
+    Command.START: _handle_start,
+    Command.STOP: _handle_stop,
+    Command.STATUS: _handle_status,
+    Command.PAUSE: _handle_pause,
+    Command.RESUME: _handle_resume,
+}
+
+
+def handle_command(timer, command):
+    if command is None or (handler := _HANDLERS.get(command["command"])) is None:
+        return _INVALID_COMMAND
+    return handler(timer, command)
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument(
         "--config",
-        default=Path().home() / ".config/pymodoro/config.toml",
+        default=os.environ.get("PYMODORO_CONFIG")
+        or os.path.expanduser("~/.config/pymodoro/config.toml"),
         dest="config_path",
     )
     parser.add_argument(
@@ -150,72 +266,25 @@ def main():
         default="WARNING",
         choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
     )
-    parser.add_argument("--socket", type=Path, default=Path("/tmp/pomodoro.sock"))
+    parser.add_argument("--socket", default="/tmp/pomodoro.sock")
     args = parser.parse_args()
 
     config = load_config(args.config_path)
 
     logging.basicConfig(level=getattr(logging, args.log_level))
-    logging.debug(f"{args=}")
-    logging.debug(f"{config=}")
-
-    args.socket.unlink(missing_ok=True)
-
-    s = socket(family=AF_UNIX)
-    s.bind(str(args.socket))
-    s.listen()
-    timer = Timer(config)
-
-    while True:
-        conn, _ = s.accept()
-        command = json.loads(conn.recv(4096).decode("utf-8"))
-        logging.debug(f"{command=}")
-        match command:
-            case {"command": Command.START, "duration": duration}:
-                try:
-                    timer.start(int(duration))
-                except AlreadyRunning:
-                    response = {"response": StartResponse.ALREADY_RUNNING}
-                else:
-                    response = {"response": StartResponse.OK, "duration": duration}
-            case {"command": Command.STOP}:
-                try:
-                    timer.stop()
-                except NotRunning:
-                    response = {"response": StopResponse.NOT_RUNNING}
-                else:
-                    response = {"response": StopResponse.OK}
-            case {"command": Command.STATUS}:
-                if (status := timer.status()) is not None:
-                    response = {
-                        "response": StatusResponse.OK,
-                        "duration": status["duration"],
-                        "remaining": status["remaining"],
-                        "is_paused": status["is_paused"],
-                    }
-                else:
-                    response = {"response": StatusResponse.OK}
-            case {"command": Command.PAUSE}:
-                try:
-                    timer.pause()
-                except AlreadyPaused:
-                    response = {"response": PauseResponse.ALREADY_PAUSED}
-                except NotRunning:
-                    response = {"response": PauseResponse.NOT_RUNNING}
-                else:
-                    response = {"response": PauseResponse.OK}
-            case {"command": Command.RESUME}:
-                try:
-                    timer.resume()
-                except NotPaused:
-                    response = {"response": ResumeResponse.NOT_PAUSED}
-                else:
-                    response = {"response": ResumeResponse.OK}
-            case _:
-                response = {"response": "INVALID_COMMAND"}
-        response = json.dumps(response).encode()
-        logging.debug(f"{response=}")
-        conn.send(response)
+    logging.debug("args=%r", args)
+    logging.debug("config=%r", config)
+
+    address = socket_address(args.socket)
+    # Abstract socket addresses start with a NUL byte and have no file to clean up.
+    socket_file = None if address.startswith("\0") else Path(address)
+    if socket_file is not None:
+        socket_file.unlink(missing_ok=True)
+    try:
+        asyncio.run(serve(address, config))
+    finally:
+        if socket_file is not None:
+            socket_file.unlink(missing_ok=True)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,96 @@
+import struct
+
+HEADER_SIZE = 4
+INVALID_COMMAND = 0
+
+_REQUEST = struct.Struct("!BI")
+_RESPONSE = struct.Struct("!B")
+_DURATION_RESPONSE = struct.Struct("!BI")
+_STATUS_RESPONSE = struct.Struct("!BIIB")
+
+
+def socket_address(path):
+    if path.startswith("@"):
+        return "\0" + path[1:]
+    return path
+
+
+def encode_request(command, duration=0):
+    return _REQUEST.pack(command, duration)
+
+
+def decode_request(message):
+    try:
+        command, duration = _REQUEST.unpack(message)
+    except struct.error as error:
+        raise ValueError(f"Malformed request: {message!r}") from error
+    return {"command": command, "duration": duration}
+
+
+def encode_response(response):
+    match response:
+        case {
+            "response": code,
+            "duration": duration,
+            "remaining": remaining,
+            "is_paused": is_paused,
+        }:
+            return _STATUS_RESPONSE.pack(code, duration, remaining, is_paused)
+        case {"response": code, "duration": duration}:
+            return _DURATION_RESPONSE.pack(code, duration)
+        case {"response": code}:
+            return _RESPONSE.pack(code)
+
+
+def decode_response(message):
+    match len(message):
+        case _STATUS_RESPONSE.size:
+            code, duration, remaining, is_paused = _STATUS_RESPONSE.unpack(message)
+            return {
+                "response": code,
+                "duration": duration,
+                "remaining": remaining,
+                "is_paused": bool(is_paused),
+            }
+        case _DURATION_RESPONSE.size:
+            code, duration = _DURATION_RESPONSE.unpack(message)
+            return {"response": code, "duration": duration}
+        case _RESPONSE.size:
+            (code,) = _RESPONSE.unpack(message)
+            return {"response": code}
+    raise ValueError(f"Malformed response: {message!r}")
+
+
+def frame(message):
+    return len(message).to_bytes(HEADER_SIZE, "big") + message
+
+
+def send_message(sock, message):
+    sock.sendall(frame(message))
+
+
+def recv_message(sock):
+    size = int.from_bytes(_recv_exactly(sock, HEADER_SIZE), "big")
+    return _recv_exactly(sock, size)
+
+
+async def read_message(reader):
+    try:
+        header = await reader.readexactly(HEADER_SIZE)
+    except EOFError as error:
+        if error.partial:
+            raise
+        return None
+    size = int.from_bytes(header, "big")
+    return await reader.readexactly(size)
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise ConnectionError("Connection closed before message was complete!")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)